@@ -46,6 +46,25 @@ extern "C" void JarvisRedirect(const char* message)
     std::cout << message << std::endl;
 }
 
+extern "C" void JarvisRedirectV(char const* const* lines, size_t const* lengths, size_t count)
+{
+    if (!lines || !lengths)
+    {
+        return;
+    }
+
+    // One call per block of Python output, each entry becomes its own log line
+    for (size_t index = 0; index < count; ++index)
+    {
+        if (lines[index])
+        {
+            std::cout.write(lines[index], static_cast<std::streamsize>(lengths[index]));
+            std::cout << '\n';
+        }
+    }
+    std::cout.flush();
+}
+
 namespace AIAssistant
 {
     // global logger for the engine and application
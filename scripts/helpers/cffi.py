@@ -0,0 +1,53 @@
+# scripts/helpers/cffi.py
+# -*- coding: utf-8 -*-
+
+"""
+Shared Python → C++ bindings.
+
+The host executable is opened once per process and its callbacks are
+resolved once here; every module imports the bound functions instead of
+calling ctypes.CDLL(None) itself.
+
+    JarvisRedirect(message: bytes) -> None   # stdout/stderr → C++ log
+    JarvisRedirectV(lines, lengths, count)   # same, many lines in one call
+    JarvisPyStatus(message: bytes) -> None   # error state → "Python Offline"
+
+A callback that cannot be resolved is None; the reason is kept in
+binding_errors under the callback name.
+
+Copyright (c) 2025 JC Technolabs
+License: GPL-3.0
+"""
+
+import ctypes
+
+binding_errors: dict[str, str] = {}
+
+try:
+    _cdll = ctypes.CDLL(None)
+except Exception as exception:
+    _cdll = None
+    _cdll_error = str(exception)
+
+
+def _bind(name: str, argtypes=(ctypes.c_char_p,)):
+    if _cdll is None:
+        binding_errors[name] = _cdll_error
+        return None
+    try:
+        function = getattr(_cdll, name)
+    except AttributeError as exception:
+        binding_errors[name] = str(exception)
+        return None
+
+    function.argtypes = list(argtypes)
+    function.restype = None
+    return function
+
+
+JarvisRedirect = _bind("JarvisRedirect")
+JarvisRedirectV = _bind(
+    "JarvisRedirectV",
+    (ctypes.POINTER(ctypes.c_char_p), ctypes.POINTER(ctypes.c_size_t), ctypes.c_size_t),
+)
+JarvisPyStatus = _bind("JarvisPyStatus")
@@ -8,13 +8,28 @@
 # Copyright (c) 2025 JC Technolabs
 # License: GPL-3.0
 
-import re
-import ctypes
-from pathlib import Path
+import os
+import shutil
+from typing import List, Optional
 
-# Regex for chunk numbering
-CHUNK_INPUT_REGEX = re.compile(r"^chunk_(\d+)\.md$")
-CHUNK_OUTPUT_REGEX = re.compile(r"^chunk_(\d+)\.output\.md$")
+from helpers.cffi import JarvisPyStatus
+from helpers.statx import stat_mtime, stat_changed, stat_mtime_changed_size
+from helpers.uring import read_files
+
+_COPY_BUFFER_SIZE = 1024 * 1024
+_TAIL_SCAN_SIZE = 4096
+_CHUNK_SEPARATOR = b"\n\n"
+_URING_MIN_CHUNKS = 8
+
+def _iov_max() -> int:
+    try:
+        value = os.sysconf("SC_IOV_MAX")
+    except (AttributeError, ValueError, OSError):
+        return 1024
+    return value if value > 0 else 1024
+
+
+_IOV_MAX = _iov_max()
 
 
 def log(msg: str) -> None:
@@ -26,13 +41,7 @@ def log(msg: str) -> None:
 # --------------------------------------------------------------------
 class _JarvisPyStatusHelper:
     def __init__(self):
-        try:
-            C = ctypes.CDLL(None)
-            C.JarvisPyStatus.argtypes = [ctypes.c_char_p]
-            C.JarvisPyStatus.restype = None
-            self._send = C.JarvisPyStatus
-        except Exception:
-            self._send = None
+        self._send = JarvisPyStatus
 
     def send(self, msg: str):
         if self._send is None:
@@ -54,6 +63,163 @@ def _notify_chunker_error(message: str):
         pass
 
 
+# --------------------------------------------------------------------
+# Helpers
+# --------------------------------------------------------------------
+def _rstripped_utf8_length(block: bytes) -> int:
+    """
+    Length of block without trailing whitespace as str.rstrip() sees it, so
+    Unicode whitespace (NBSP, U+3000, U+2028, ...) is trimmed like ASCII.
+    """
+    text = block.decode("utf-8", "surrogateescape").rstrip()
+    return len(text.encode("utf-8", "surrogateescape"))
+
+
+def _is_utf8_continuation(byte: int) -> bool:
+    return 0x80 <= byte < 0xC0
+
+
+def _rstrip_offset(file, start: int, end: int) -> int:
+    """Return the offset where trailing whitespace of file[start:end] begins."""
+    while end > start:
+        # read up to 3 bytes more so the block can start on a character
+        block_start = max(start, end - _TAIL_SCAN_SIZE)
+        read_start = max(start, block_start - 3)
+        file.seek(read_start)
+        block = file.read(end - read_start)
+        skip = block_start - read_start
+        while skip > 0 and _is_utf8_continuation(block[skip]):
+            skip -= 1
+        block_start = read_start + skip
+
+        stripped = _rstripped_utf8_length(block[skip:])
+        if stripped:
+            return block_start + stripped
+        end = block_start
+    return start
+
+
+def _writev_all(fd: int, buffers: list) -> None:
+    """os.writev() that finishes a short write with plain os.write()."""
+    written = os.writev(fd, buffers)
+    if written < sum(len(buffer) for buffer in buffers):
+        remainder = memoryview(b"".join(buffers))[written:]
+        while remainder:
+            remainder = remainder[os.write(fd, remainder):]
+
+
+def _rstripped_length(data) -> int:
+    """Length of data without trailing whitespace, scanning back from the end."""
+    end = len(data)
+    while end > 0:
+        start = max(0, end - _TAIL_SCAN_SIZE)
+        # never split a multi-byte character at the block start
+        while start > 0 and end - start < _TAIL_SCAN_SIZE + 3 and _is_utf8_continuation(data[start]):
+            start -= 1
+        stripped = _rstripped_utf8_length(bytes(data[start:end]))
+        if stripped:
+            return start + stripped
+        end = start
+    return 0
+
+
+def _read_file(path: str, size: int) -> memoryview:
+    """
+    Read path into one buffer sized from its stat (plus one byte, so
+    end-of-file needs no extra buffer); a file that grew since is read on
+    into a larger buffer.
+    """
+    buffer = bytearray(size + 1)
+    filled = 0
+    with open(path, "rb", buffering=0) as source:
+        while True:
+            if filled == len(buffer):
+                buffer += bytes(len(buffer))
+            count = source.readinto(memoryview(buffer)[filled:])
+            if not count:
+                break
+            filled += count
+    return memoryview(buffer)[:filled]
+
+
+def _write_combined_vectored(combined_output: str, sources: List[str], sizes: List[int]) -> Optional[str]:
+    """
+    Write all chunks plus separators with one writev() per IOV_MAX buffers.
+    Each chunk is read into one buffer sized from sizes and handed to
+    writev() as a view without its trailing whitespace, so its bytes are not
+    copied again (with more than _URING_MIN_CHUNKS chunks they are read in
+    one io_uring batch instead). Chunks are not memory-mapped: the host
+    rewrites outputs in place with truncation, and touching a truncated
+    mapping raises SIGBUS in the whole process.
+    Returns an error message on failure, None on success.
+    """
+    try:
+        fd = os.open(combined_output, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    except OSError as exception:
+        return f"ChunkCombiner: failed to write combined output {combined_output}: {exception}"
+
+    try:
+        # many chunks: batch all opens/reads through io_uring when available
+        contents = None
+        if len(sources) > _URING_MIN_CHUNKS:
+            try:
+                contents = read_files(sources, sizes)
+            except OSError as exception:
+                return f"ChunkCombiner: failed to read chunk output {exception.filename}: {exception}"
+
+        buffers: list = []
+        for position, output_file in enumerate(sources):
+            if len(buffers) + 2 > _IOV_MAX:
+                _writev_all(fd, buffers)
+                buffers = []
+
+            if contents is not None:
+                data = contents[position]
+            else:
+                try:
+                    data = _read_file(output_file, sizes[position])
+                except Exception as exception:
+                    return f"ChunkCombiner: failed to read chunk output {output_file}: {exception}"
+
+            buffers.append(data[:_rstripped_length(data)])
+            buffers.append(_CHUNK_SEPARATOR)
+
+        if buffers:
+            _writev_all(fd, buffers)
+    except Exception as exception:
+        return f"ChunkCombiner: failed to write combined output {combined_output}: {exception}"
+    finally:
+        os.close(fd)
+
+    return None
+
+
+def _write_combined_streamed(combined_output: str, sources: List[str]) -> Optional[str]:
+    """
+    Fallback for platforms without os.writev(): copy each chunk as-is, then
+    move the write position back over its trailing whitespace before the
+    separator goes in. Returns an error message on failure, None on success.
+    """
+    try:
+        with open(combined_output, "w+b") as destination:
+            for output_file in sources:
+                start = destination.tell()
+                try:
+                    with open(output_file, "rb") as source:
+                        shutil.copyfileobj(source, destination, _COPY_BUFFER_SIZE)
+                except Exception as exception:
+                    return f"ChunkCombiner: failed to read chunk output {output_file}: {exception}"
+
+                destination.seek(_rstrip_offset(destination, start, destination.tell()))
+                destination.write(_CHUNK_SEPARATOR)
+
+            destination.truncate()
+    except Exception as exception:
+        return f"ChunkCombiner: failed to write combined output {combined_output}: {exception}"
+
+    return None
+
+
 # --------------------------------------------------------------------
 # Chunk combination
 # --------------------------------------------------------------------
@@ -72,106 +238,132 @@ def handle_chunk_output_added(trigger_file: str) -> None:
     Hard failures report to C++ → Stop Python Engine.
     """
 
-    trigger_path = Path(trigger_file)
-    folder = trigger_path.parent
+    # plain str paths from here on; Path objects only cost time in the walk
+    trigger_file = os.fspath(trigger_file)
+    folder = os.path.dirname(trigger_file) or "."
+
+    # ------------------------------------------------------------------
+    # Determine combined output file location
+    # ------------------------------------------------------------------
+    folder_name = os.path.basename(folder)
+    is_chunks_folder = folder_name.endswith("_chunks")
+    original_md_name = folder_name.replace("_chunks", "")
+    combined_output = os.path.join(
+        os.path.dirname(folder), original_md_name.replace(".md", ".output.md")
+    )
+
+    # Stat the combined output up front; None means it has to be (re)built
+    combined_mtime = None
+    if is_chunks_folder:
+        try:
+            combined_mtime = stat_mtime(combined_output)
+        except FileNotFoundError:
+            pass
+        except Exception as exception:
+            _notify_chunker_error(
+                f"ChunkCombiner: failed combined-output timestamp check: {exception}"
+            )
+            return
+
+    # Spurious retrigger: the combined output is already newer than the
+    # chunk output that triggered us, so there is no need to walk the folder.
+    # This relies on the trigger being the newest chunk output of its burst
+    # (main.py coalesces events and passes exactly that one); a single older
+    # trigger says nothing about the other chunks. The trigger's ctime counts
+    # too, so an output copied in with an old mtime is not skipped.
+    if combined_mtime is not None:
+        try:
+            if combined_mtime >= stat_changed(trigger_file):
+                return
+        except OSError:
+            pass
 
     # ------------------------------------------------------------------
-    # Gather all chunk input files
+    # Gather chunk inputs, outputs and their mtimes in one directory walk
     # ------------------------------------------------------------------
-    chunk_inputs: dict[int, Path] = {}
+    # index → [input mtime, output path, output mtime, output size, output
+    # changed time (later of mtime and ctime)]; every later check reads from
+    # here, so each chunk file is stat'ed exactly once.
+    chunks: dict[int, list] = {}
+    new_chunk = chunks.setdefault
+    read_mtime = stat_mtime
+    read_output_stat = stat_mtime_changed_size
     try:
-        for file_path in folder.iterdir():
-            match = CHUNK_INPUT_REGEX.match(file_path.name)
-            if match:
-                index = int(match.group(1))
-                chunk_inputs[index] = file_path
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                name = entry.name
+                if not (name.startswith("chunk_") and name.endswith(".md")):
+                    continue
+                is_output = name.endswith(".output.md")
+                digits = name[6:-10] if is_output else name[6:-3]
+                if not digits.isdecimal():
+                    continue
+
+                chunk = new_chunk(int(digits), [None, None, None, 0, None])
+                path = entry.path
+                if is_output:
+                    chunk[1] = path
+                    chunk[2], chunk[4], chunk[3] = read_output_stat(path)
+                else:
+                    chunk[0] = read_mtime(path)
     except Exception as exception:
         _notify_chunker_error(f"ChunkCombiner: failed to iterate folder {folder}: {exception}")
         return
 
     # No chunks -> ignore
-    if not chunk_inputs:
+    if not any(chunk[0] is not None for chunk in chunks.values()):
         return
 
     # ------------------------------------------------------------------
     # Check output chunks (soft waiting)
     # ------------------------------------------------------------------
-    chunk_outputs: dict[int, Path] = {}
-    for index, input_file in chunk_inputs.items():
-        output = folder / f"chunk_{index:03d}.output.md"
+    chunk_outputs: dict[int, str] = {}
+    newest_chunk_mtime = 0.0
+    for index, (input_mtime, output_path, output_mtime, _, output_changed) in chunks.items():
+        # Outputs without a matching input are ignored
+        if input_mtime is None:
+            continue
 
         # Soft conditions
-        if not output.exists():
+        if output_path is None or output_mtime <= input_mtime:
             return
 
-        try:
-            if output.stat().st_mtime <= input_file.stat().st_mtime:
-                return
-        except Exception as exception:
-            _notify_chunker_error(f"ChunkCombiner: failed timestamp check: {exception}")
-            return
-
-        chunk_outputs[index] = output
+        newest_chunk_mtime = max(newest_chunk_mtime, output_changed)
+        chunk_outputs[index] = output_path
 
-    # ------------------------------------------------------------------
-    # Determine combined output file location
-    # ------------------------------------------------------------------
-    folder_name = folder.name
-    if not folder_name.endswith("_chunks"):
+    # only a complete set of outputs makes a bad folder name a hard error
+    if not is_chunks_folder:
         _notify_chunker_error(
             f"ChunkCombiner: folder name does not end with '_chunks': {folder_name}"
         )
         return
 
-    original_md_name = folder_name.replace("_chunks", "")
-    combined_output = folder.parent / original_md_name.replace(".md", ".output.md")
-
     # ------------------------------------------------------------------
     # Skip recombination if combined output is newer than all chunks
     # ------------------------------------------------------------------
-    try:
-        if combined_output.exists():
-            combined_mtime = combined_output.stat().st_mtime
-            newest_chunk_mtime = max(p.stat().st_mtime for p in chunk_outputs.values())
-            if newest_chunk_mtime <= combined_mtime:
-                return
-    except Exception as exception:
-        _notify_chunker_error(
-            f"ChunkCombiner: failed combined-output timestamp check: {exception}"
-        )
+    if combined_mtime is not None and newest_chunk_mtime <= combined_mtime:
         return
 
     # ------------------------------------------------------------------
-    # Combine sorted outputs
+    # Write sorted outputs into the final combined output
     # ------------------------------------------------------------------
     sorted_indices = sorted(chunk_outputs.keys())
     log(f"Combining {len(sorted_indices)} chunks into: {combined_output}")
 
-    combined_parts: list[str] = []
+    sources = [chunk_outputs[index] for index in sorted_indices]
+    if hasattr(os, "writev"):
+        sizes = [chunks[index][3] for index in sorted_indices]
+        failure = _write_combined_vectored(combined_output, sources, sizes)
+    else:
+        failure = _write_combined_streamed(combined_output, sources)
 
-    for index in sorted_indices:
-        output_file = chunk_outputs[index]
+    if failure is not None:
+        # A partial file would look up to date and block recombination
         try:
-            text = output_file.read_text(encoding="utf-8").rstrip()
-        except Exception as exception:
-            _notify_chunker_error(
-                f"ChunkCombiner: failed to read chunk output {output_file}: {exception}"
-            )
-            return
-
-        combined_parts.append(text + "\n\n")
-
-    combined_text = "".join(combined_parts)
-
-    # ------------------------------------------------------------------
-    # Write final combined output
-    # ------------------------------------------------------------------
-    try:
-        combined_output.write_text(combined_text, encoding="utf-8")
-    except Exception as exception:
-        _notify_chunker_error(
-            f"ChunkCombiner: failed to write combined output {combined_output}: {exception}"
-        )
+            os.unlink(combined_output)
+        except OSError:
+            pass
+        _notify_chunker_error(failure)
         return
 
     log(f"Combined file written: {combined_output}")
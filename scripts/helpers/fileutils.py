@@ -1,5 +1,6 @@
 import os
-import ctypes
+
+from helpers.cffi import JarvisPyStatus
 
 """
 Helpers for file detection.
@@ -13,13 +14,7 @@ License: GPL-3.0
 # --------------------------------------------------------------------
 class _JarvisPyStatusHelper:
     def __init__(self):
-        try:
-            C = ctypes.CDLL(None)
-            C.JarvisPyStatus.argtypes = [ctypes.c_char_p]
-            C.JarvisPyStatus.restype = None
-            self._send = C.JarvisPyStatus
-        except Exception:
-            self._send = None
+        self._send = JarvisPyStatus
 
     def send(self, message: str):
         if self._send is None:
@@ -4,16 +4,30 @@ Copyright (c) 2025 JC Technolabs
 
 """
 
-import datetime
+import time
+
+_INFO_PREFIX = "[PY][INFO "
+_WARN_PREFIX = "[PY][WARN "
+_ERROR_PREFIX = "[PY][ERR  "
+_TIMESTAMP_SUFFIX = "] "
+
+# (second, "%H:%M:%S") — replaced as a whole so threads never see a torn pair
+_cached_timestamp = (-1, "")
 
 def _timestamp():
-    return datetime.datetime.now().strftime("%H:%M:%S")
+    global _cached_timestamp
+    second = int(time.time())
+    cached_second, text = _cached_timestamp
+    if second != cached_second:
+        text = time.strftime("%H:%M:%S", time.localtime(second))
+        _cached_timestamp = (second, text)
+    return text
 
 def log_info(message):
-    print(f"[PY][INFO { _timestamp() }] {message}")
+    print(_INFO_PREFIX + _timestamp() + _TIMESTAMP_SUFFIX + str(message))
 
 def log_warn(message):
-    print(f"[PY][WARN { _timestamp() }] {message}")
+    print(_WARN_PREFIX + _timestamp() + _TIMESTAMP_SUFFIX + str(message))
 
 def log_error(message):
-    print(f"[PY][ERR  { _timestamp() }] {message}")
+    print(_ERROR_PREFIX + _timestamp() + _TIMESTAMP_SUFFIX + str(message))
@@ -24,10 +24,10 @@ License: GPL-3.0
 
 import os
 import subprocess
-import ctypes
 from pathlib import Path
 
 from helpers.log import log_info, log_warn, log_error
+from helpers.cffi import JarvisPyStatus
 
 
 # --------------------------------------------------------------------
@@ -35,13 +35,7 @@ from helpers.log import log_info, log_warn, log_error
 # --------------------------------------------------------------------
 class _JarvisPyStatusHelper:
     def __init__(self):
-        try:
-            C = ctypes.CDLL(None)
-            C.JarvisPyStatus.argtypes = [ctypes.c_char_p]
-            C.JarvisPyStatus.restype = None
-            self._send = C.JarvisPyStatus
-        except Exception:
-            self._send = None
+        self._send = JarvisPyStatus
 
     def send(self, message: str):
         if self._send is None:
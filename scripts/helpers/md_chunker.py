@@ -17,12 +17,12 @@ License: GPL-3.0
 import os
 import json
 import re
-import ctypes
 from pathlib import Path
 from typing import List
 
 from helpers.log import log_info, log_warn, log_error
 from helpers.fileutils import read_text_file, write_text_file
+from helpers.cffi import JarvisPyStatus
 
 
 # --------------------------------------------------------------------
@@ -30,13 +30,7 @@ from helpers.fileutils import read_text_file, write_text_file
 # --------------------------------------------------------------------
 class _JarvisPyStatusHelper:
     def __init__(self):
-        try:
-            C = ctypes.CDLL(None)
-            C.JarvisPyStatus.argtypes = [ctypes.c_char_p]
-            C.JarvisPyStatus.restype = None
-            self._send = C.JarvisPyStatus
-        except Exception:
-            self._send = None
+        self._send = JarvisPyStatus
 
     def send(self, msg: str):
         if self._send is None:
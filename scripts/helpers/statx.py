@@ -0,0 +1,132 @@
+# scripts/helpers/statx.py
+# -*- coding: utf-8 -*-
+
+"""
+Narrow stat (mtime, ctime, size) for the chunk combiner.
+
+On Linux, statx() is called through ctypes with STATX_MTIME (plus
+STATX_CTIME/STATX_SIZE where the caller wants them) and AT_STATX_DONT_SYNC,
+so the kernel fills in only those fields and never syncs with a remote
+file system first. Everywhere else (or when libc/kernel lack statx) this
+falls back to os.stat().
+
+Copyright (c) 2025 JC Technolabs
+License: GPL-3.0
+"""
+
+import os
+import sys
+import errno
+import ctypes
+
+AT_FDCWD = -100
+AT_STATX_DONT_SYNC = 0x4000
+STATX_CTIME = 0x0080
+STATX_MTIME = 0x0040
+STATX_SIZE = 0x0200
+
+
+class _StatxTimestamp(ctypes.Structure):
+    _fields_ = [
+        ("tv_sec", ctypes.c_int64),
+        ("tv_nsec", ctypes.c_uint32),
+        ("__reserved", ctypes.c_int32),
+    ]
+
+
+class _Statx(ctypes.Structure):
+    # struct statx from <linux/stat.h>, 256 bytes
+    _fields_ = [
+        ("stx_mask", ctypes.c_uint32),
+        ("stx_blksize", ctypes.c_uint32),
+        ("stx_attributes", ctypes.c_uint64),
+        ("stx_nlink", ctypes.c_uint32),
+        ("stx_uid", ctypes.c_uint32),
+        ("stx_gid", ctypes.c_uint32),
+        ("stx_mode", ctypes.c_uint16),
+        ("__spare0", ctypes.c_uint16),
+        ("stx_ino", ctypes.c_uint64),
+        ("stx_size", ctypes.c_uint64),
+        ("stx_blocks", ctypes.c_uint64),
+        ("stx_attributes_mask", ctypes.c_uint64),
+        ("stx_atime", _StatxTimestamp),
+        ("stx_btime", _StatxTimestamp),
+        ("stx_ctime", _StatxTimestamp),
+        ("stx_mtime", _StatxTimestamp),
+        ("__spare", ctypes.c_uint64 * 16),
+    ]
+
+
+def _load_statx():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        function = libc.statx  # glibc >= 2.28
+    except (OSError, AttributeError):
+        return None
+
+    function.argtypes = [
+        ctypes.c_int,
+        ctypes.c_char_p,
+        ctypes.c_int,
+        ctypes.c_uint,
+        ctypes.POINTER(_Statx),
+    ]
+    function.restype = ctypes.c_int
+    return function
+
+
+_statx = _load_statx()
+
+
+def stat_mtime(path) -> float:
+    """
+    Return the modification time of path in seconds, like os.stat().st_mtime.
+    Raises OSError (FileNotFoundError, ...) just like os.stat().
+    """
+    return _stat(path, STATX_MTIME)[0]
+
+
+def stat_changed(path) -> float:
+    """
+    Return the later of mtime and ctime. Unlike the mtime alone, this also
+    moves for a file copied (cp -p, rsync) or moved in with an old mtime.
+    """
+    return _stat(path, STATX_MTIME | STATX_CTIME)[1]
+
+
+def stat_mtime_changed_size(path) -> tuple[float, float, int]:
+    """Return (mtime, stat_changed() time, size in bytes) with one call."""
+    return _stat(path, STATX_MTIME | STATX_CTIME | STATX_SIZE)
+
+
+def _seconds(timestamp: _StatxTimestamp) -> float:
+    return timestamp.tv_sec + timestamp.tv_nsec * 1e-9
+
+
+def _os_stat(path) -> tuple[float, float, int]:
+    result = os.stat(path)
+    return result.st_mtime, max(result.st_mtime, result.st_ctime), result.st_size
+
+
+def _stat(path, mask: int) -> tuple[float, float, int]:
+    global _statx
+
+    if _statx is None:
+        return _os_stat(path)
+
+    buffer = _Statx()
+    if _statx(AT_FDCWD, os.fsencode(path), AT_STATX_DONT_SYNC, mask, ctypes.byref(buffer)) != 0:
+        error = ctypes.get_errno()
+        if error in (errno.ENOSYS, errno.EPERM):
+            # kernel < 4.11 or a seccomp filter without statx: stop trying
+            _statx = None
+            return _os_stat(path)
+        raise OSError(error, os.strerror(error), os.fspath(path))
+
+    if buffer.stx_mask & mask != mask:
+        return _os_stat(path)
+
+    mtime = _seconds(buffer.stx_mtime)
+    return mtime, max(mtime, _seconds(buffer.stx_ctime)), buffer.stx_size
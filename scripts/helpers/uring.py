@@ -0,0 +1,362 @@
+# scripts/helpers/uring.py
+# -*- coding: utf-8 -*-
+
+"""
+Batched file reads through io_uring for the chunk combiner.
+
+All opens of a batch go to the kernel in one io_uring_enter(), then all
+reads, then all closes — instead of an openat/read/close round-trip per
+file. The ring is driven directly through the io_uring syscalls and mmap
+(liburing's submission helpers are header-inline and not exported), so
+there is no extra dependency.
+
+Each file is read into one buffer sized from the caller's stat (plus one
+byte, so end-of-file shows up without another buffer). Reads are repeated
+until every file reports end-of-file, since a short read is legal on
+NFS/FUSE.
+
+read_files() returns None whenever io_uring cannot be used (non-Linux,
+kernel < 5.6, io_uring disabled); callers then read the files themselves.
+
+Copyright (c) 2025 JC Technolabs
+License: GPL-3.0
+"""
+
+import os
+import sys
+import mmap
+import errno
+import ctypes
+from typing import List, Optional, Sequence
+
+_SYS_IO_URING_SETUP = 425
+_SYS_IO_URING_ENTER = 426
+
+_IORING_OFF_SQ_RING = 0
+_IORING_OFF_CQ_RING = 0x8000000
+_IORING_OFF_SQES = 0x10000000
+_IORING_FEAT_SINGLE_MMAP = 1 << 0
+_IORING_ENTER_GETEVENTS = 1 << 0
+
+_IORING_OP_OPENAT = 18
+_IORING_OP_CLOSE = 19
+_IORING_OP_READ = 22
+
+_AT_FDCWD = -100
+
+_RING_ENTRIES = 256
+_READ_SIZE = 64 * 1024
+_MIN_KERNEL = (5, 6)  # IORING_OP_OPENAT / IORING_OP_READ
+
+
+class _SqringOffsets(ctypes.Structure):
+    _fields_ = [
+        ("head", ctypes.c_uint32),
+        ("tail", ctypes.c_uint32),
+        ("ring_mask", ctypes.c_uint32),
+        ("ring_entries", ctypes.c_uint32),
+        ("flags", ctypes.c_uint32),
+        ("dropped", ctypes.c_uint32),
+        ("array", ctypes.c_uint32),
+        ("resv1", ctypes.c_uint32),
+        ("user_addr", ctypes.c_uint64),
+    ]
+
+
+class _CqringOffsets(ctypes.Structure):
+    _fields_ = [
+        ("head", ctypes.c_uint32),
+        ("tail", ctypes.c_uint32),
+        ("ring_mask", ctypes.c_uint32),
+        ("ring_entries", ctypes.c_uint32),
+        ("overflow", ctypes.c_uint32),
+        ("cqes", ctypes.c_uint32),
+        ("flags", ctypes.c_uint32),
+        ("resv1", ctypes.c_uint32),
+        ("user_addr", ctypes.c_uint64),
+    ]
+
+
+class _Params(ctypes.Structure):
+    _fields_ = [
+        ("sq_entries", ctypes.c_uint32),
+        ("cq_entries", ctypes.c_uint32),
+        ("flags", ctypes.c_uint32),
+        ("sq_thread_cpu", ctypes.c_uint32),
+        ("sq_thread_idle", ctypes.c_uint32),
+        ("features", ctypes.c_uint32),
+        ("wq_fd", ctypes.c_uint32),
+        ("resv", ctypes.c_uint32 * 3),
+        ("sq_off", _SqringOffsets),
+        ("cq_off", _CqringOffsets),
+    ]
+
+
+class _Sqe(ctypes.Structure):
+    # struct io_uring_sqe, 64 bytes (unions flattened to the members used here)
+    _fields_ = [
+        ("opcode", ctypes.c_uint8),
+        ("flags", ctypes.c_uint8),
+        ("ioprio", ctypes.c_uint16),
+        ("fd", ctypes.c_int32),
+        ("off", ctypes.c_uint64),
+        ("addr", ctypes.c_uint64),
+        ("len", ctypes.c_uint32),
+        ("op_flags", ctypes.c_uint32),
+        ("user_data", ctypes.c_uint64),
+        ("buf_index", ctypes.c_uint16),
+        ("personality", ctypes.c_uint16),
+        ("file_index", ctypes.c_int32),
+        ("addr3", ctypes.c_uint64),
+        ("pad2", ctypes.c_uint64),
+    ]
+
+
+class _Cqe(ctypes.Structure):
+    _fields_ = [
+        ("user_data", ctypes.c_uint64),
+        ("res", ctypes.c_int32),
+        ("flags", ctypes.c_uint32),
+    ]
+
+
+def _kernel_supported() -> bool:
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        release = os.uname().release.split("-")[0].split(".")
+        return (int(release[0]), int(release[1])) >= _MIN_KERNEL
+    except (AttributeError, ValueError, IndexError):
+        return False
+
+
+def _load_syscall():
+    if not _kernel_supported():
+        return None
+    try:
+        function = ctypes.CDLL(None, use_errno=True).syscall
+    except (OSError, AttributeError):
+        return None
+    function.restype = ctypes.c_long
+    return function
+
+
+_syscall = _load_syscall()
+
+
+def _address(buffer) -> int:
+    anchor = ctypes.c_char.from_buffer(buffer)
+    address = ctypes.addressof(anchor)
+    del anchor  # release the buffer export so the mmap can be closed later
+    return address
+
+
+class _Ring:
+    """A single-use io_uring with its SQ/CQ rings and SQE array mapped."""
+
+    def __init__(self, entries: int):
+        params = _Params()
+        fd = _syscall(_SYS_IO_URING_SETUP, ctypes.c_uint(entries), ctypes.byref(params))
+        if fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+        self._fd = fd
+        self._maps: List[mmap.mmap] = []
+        try:
+            self._map_rings(params)
+        except Exception:
+            self.close()
+            raise
+
+    def _map(self, size: int, offset: int) -> mmap.mmap:
+        mapping = mmap.mmap(
+            self._fd,
+            size,
+            flags=mmap.MAP_SHARED,
+            prot=mmap.PROT_READ | mmap.PROT_WRITE,
+            offset=offset,
+        )
+        self._maps.append(mapping)
+        return mapping
+
+    def _map_rings(self, params: _Params) -> None:
+        sq_off = params.sq_off
+        cq_off = params.cq_off
+        sq_size = sq_off.array + params.sq_entries * ctypes.sizeof(ctypes.c_uint32)
+        cq_size = cq_off.cqes + params.cq_entries * ctypes.sizeof(_Cqe)
+
+        if params.features & _IORING_FEAT_SINGLE_MMAP:
+            sq_base = cq_base = _address(self._map(max(sq_size, cq_size), _IORING_OFF_SQ_RING))
+        else:
+            sq_base = _address(self._map(sq_size, _IORING_OFF_SQ_RING))
+            cq_base = _address(self._map(cq_size, _IORING_OFF_CQ_RING))
+
+        sqes_base = _address(self._map(params.sq_entries * ctypes.sizeof(_Sqe), _IORING_OFF_SQES))
+
+        self.sq_entries = params.sq_entries
+        self._sq_tail = ctypes.c_uint32.from_address(sq_base + sq_off.tail)
+        self._sq_mask = ctypes.c_uint32.from_address(sq_base + sq_off.ring_mask).value
+        self._sq_array = (ctypes.c_uint32 * params.sq_entries).from_address(sq_base + sq_off.array)
+        self._sqes = (_Sqe * params.sq_entries).from_address(sqes_base)
+
+        self._cq_head = ctypes.c_uint32.from_address(cq_base + cq_off.head)
+        self._cq_tail = ctypes.c_uint32.from_address(cq_base + cq_off.tail)
+        self._cq_mask = ctypes.c_uint32.from_address(cq_base + cq_off.ring_mask).value
+        self._cqes = (_Cqe * params.cq_entries).from_address(cq_base + cq_off.cqes)
+
+    def submit_and_wait(self, sqes: List[dict]) -> List[int]:
+        """
+        Submit one SQE per dict (fields of _Sqe, user_data set to the list
+        position) with a single io_uring_enter() and return the CQE results
+        in submission order. Caller keeps len(sqes) <= sq_entries.
+        """
+        tail = self._sq_tail.value
+        for position, fields in enumerate(sqes):
+            index = tail & self._sq_mask
+            sqe = self._sqes[index]
+            ctypes.memset(ctypes.byref(sqe), 0, ctypes.sizeof(_Sqe))
+            for name, value in fields.items():
+                setattr(sqe, name, value)
+            sqe.user_data = position
+            self._sq_array[index] = index
+            tail += 1
+        self._sq_tail.value = tail
+
+        results = [0] * len(sqes)
+        to_submit = len(sqes)
+        pending = len(sqes)
+        while pending:
+            submitted = _syscall(
+                _SYS_IO_URING_ENTER,
+                ctypes.c_uint(self._fd),
+                ctypes.c_uint(to_submit),
+                ctypes.c_uint(pending),
+                ctypes.c_uint(_IORING_ENTER_GETEVENTS),
+                None,
+                ctypes.c_size_t(0),
+            )
+            if submitted < 0:
+                error = ctypes.get_errno()
+                if error == errno.EINTR:
+                    continue
+                raise OSError(error, os.strerror(error))
+            to_submit -= min(to_submit, submitted)
+
+            head = self._cq_head.value
+            while head != self._cq_tail.value:
+                cqe = self._cqes[head & self._cq_mask]
+                results[cqe.user_data] = cqe.res
+                pending -= 1
+                head += 1
+            self._cq_head.value = head
+
+        return results
+
+    def close(self) -> None:
+        for mapping in self._maps:
+            mapping.close()
+        self._maps = []
+        os.close(self._fd)
+
+
+def read_files(paths: List[str], sizes: Optional[Sequence[int]] = None) -> Optional[List[memoryview]]:
+    """
+    Read every file in paths completely, batching opens, reads and closes
+    through io_uring. sizes (same order as paths) are the expected file
+    sizes; without them each file starts with a _READ_SIZE buffer. Returns
+    None if io_uring is unavailable. Raises OSError (with .filename set) if
+    a file cannot be opened or read.
+    """
+    if _syscall is None:
+        return None
+
+    try:
+        ring = _Ring(min(_RING_ENTRIES, max(1, len(paths))))
+    except OSError:
+        return None
+
+    if sizes is None:
+        sizes = [_READ_SIZE] * len(paths)
+
+    contents: List[memoryview] = []
+    try:
+        batch_size = ring.sq_entries
+        for start in range(0, len(paths), batch_size):
+            end = start + batch_size
+            contents.extend(_read_batch(ring, paths[start:end], sizes[start:end]))
+    finally:
+        ring.close()
+
+    return contents
+
+
+def _read_batch(ring: _Ring, paths: List[str], sizes: Sequence[int]) -> List[memoryview]:
+    # keep the encoded paths and buffers alive until the kernel is done
+    encoded = [os.fsencode(path) for path in paths]
+    results = ring.submit_and_wait([
+        {
+            "opcode": _IORING_OP_OPENAT,
+            "fd": _AT_FDCWD,
+            "addr": ctypes.cast(ctypes.c_char_p(name), ctypes.c_void_p).value,
+            "op_flags": os.O_RDONLY | os.O_CLOEXEC,
+        }
+        for name in encoded
+    ])
+
+    fds = [result for result in results if result >= 0]
+    try:
+        for path, result in zip(paths, results):
+            if result < 0:
+                raise OSError(-result, os.strerror(-result), path)
+
+        # per file: filled buffers, bytes in the last one, file offset
+        buffers = [[bytearray(size + 1)] for size in sizes]
+        filled = [0] * len(fds)
+        offsets = [0] * len(fds)
+
+        pending = list(range(len(fds)))
+        while pending:
+            for position in pending:
+                if filled[position] == len(buffers[position][-1]):
+                    # grew since it was stat'ed
+                    buffers[position].append(bytearray(_READ_SIZE))
+                    filled[position] = 0
+
+            results = ring.submit_and_wait([
+                {
+                    "opcode": _IORING_OP_READ,
+                    "fd": fds[position],
+                    "off": offsets[position],
+                    "addr": _address(buffers[position][-1]) + filled[position],
+                    "len": len(buffers[position][-1]) - filled[position],
+                }
+                for position in pending
+            ])
+
+            # anything but 0 (end-of-file) may be a short read: go again
+            unfinished = []
+            for position, result in zip(pending, results):
+                if result < 0:
+                    raise OSError(-result, os.strerror(-result), paths[position])
+                if result > 0:
+                    filled[position] += result
+                    offsets[position] += result
+                    unfinished.append(position)
+            pending = unfinished
+
+        contents: List[memoryview] = []
+        for file_buffers, last_filled in zip(buffers, filled):
+            if len(file_buffers) == 1:
+                contents.append(memoryview(file_buffers[0])[:last_filled])
+            else:
+                file_buffers[-1] = file_buffers[-1][:last_filled]
+                contents.append(memoryview(b"".join(file_buffers)))
+    finally:
+        try:
+            ring.submit_and_wait([{"opcode": _IORING_OP_CLOSE, "fd": fd} for fd in fds])
+        except OSError:
+            for fd in fds:
+                os.close(fd)
+
+    return contents
@@ -15,22 +15,20 @@ Copyright (c) 2025 JC Technolabs
 License: GPL-3.0
 """
 
-from pathlib import Path
-import re
+import os
 import sys
+import time
+import queue
 import ctypes
+import threading
 import traceback
 
 from helpers.log import log_info, log_warn, log_error
-from helpers.fileutils import (
-    is_pdf,
-    is_docx,
-    is_xlsx,
-    is_pptx,
-)
+from helpers.cffi import JarvisRedirect, JarvisRedirectV, JarvisPyStatus, binding_errors
 from helpers.markitdown_tools import convert_with_markitdown
 from helpers.md_chunker import chunk_markdown_if_needed
 from helpers.chunk_combiner import handle_chunk_output_added
+from helpers.statx import stat_changed
 
 
 # --------------------------------------------------------------------
@@ -38,15 +36,10 @@ from helpers.chunk_combiner import handle_chunk_output_added
 # --------------------------------------------------------------------
 class _JarvisPyStatus:
     def __init__(self):
-        try:
-            C = ctypes.CDLL(None)
-            C.JarvisPyStatus.argtypes = [ctypes.c_char_p]
-            C.JarvisPyStatus.restype = None
-            self._send = C.JarvisPyStatus
-        except Exception as exception:
+        self._send = JarvisPyStatus
+        if self._send is None:
             # Hard-stop: cannot report errors → engine must shut down
-            log_error(f"Failed to initialize JarvisPyStatus: {exception}")
-            self._send = None
+            log_error(f"Failed to initialize JarvisPyStatus: {binding_errors.get('JarvisPyStatus')}")
 
     def send(self, msg: str):
         if self._send is None:
@@ -73,17 +66,35 @@ def notify_python_error(message: str):
 # --------------------------------------------------------------------
 class _JarvisRedirect:
     def __init__(self):
-        try:
-            C = ctypes.CDLL(None)
-            C.JarvisRedirect.argtypes = [ctypes.c_char_p]
-            C.JarvisRedirect.restype = None
-            self._redirect = C.JarvisRedirect
-        except Exception as exception:
-            notify_python_error(f"Failed to initialize JarvisRedirect: {exception}")
-            self._redirect = None
-
-        # Local buffer to assemble complete lines before sending to C++
-        self._buffer = ""
+        self._redirect = JarvisRedirect
+        if self._redirect is None:
+            notify_python_error(
+                f"Failed to initialize JarvisRedirect: {binding_errors.get('JarvisRedirect')}"
+            )
+
+        # Optional: whole list of lines in one call (older hosts lack it)
+        self._redirect_lines = JarvisRedirectV
+
+        # Local UTF-8 buffer to assemble complete lines before sending to C++
+        self._buffer = bytearray()
+
+        # stdout/stderr are shared by the host thread, the worker and the
+        # chunk timer thread; write()/flush() run whole under this lock
+        self._lock = threading.Lock()
+
+    def _send(self, lines):
+        if self._redirect_lines is not None:
+            count = len(lines)
+            self._redirect_lines(
+                (ctypes.c_char_p * count)(*lines),
+                (ctypes.c_size_t * count)(*map(len, lines)),
+                count,
+            )
+        else:
+            # one call per line: the host logs each JarvisRedirect() call as
+            # a single entry, so a joined block would render as one entry
+            for line in lines:
+                self._redirect(line + b"\n")
 
     def write(self, msg):
         # Important: do NOT drop newline-only messages.
@@ -96,36 +107,46 @@ class _JarvisRedirect:
             notify_python_error("JarvisRedirect.write() called but redirect function is missing")
             return
 
+        # error reports print() again, so they run only after the lock is released
         try:
-            self._buffer += msg
-            while "\n" in self._buffer:
-                line, rest = self._buffer.split("\n", 1)
-                self._buffer = rest
+            with self._lock:
+                buffer = self._buffer
+                buffer += msg.encode("utf-8")
 
-                # Skip completely empty lines (avoid pure blank log lines)
-                if line == "":
-                    continue
+                # Send every complete line in one call, keep the partial tail
+                end = buffer.rfind(b"\n") + 1
+                if end == 0:
+                    return
+                lines = bytes(buffer[:end]).split(b"\n")
+                del buffer[:end]
 
-                self._redirect((line + "\n").encode("utf-8"))
+                # Skip completely empty lines (avoid pure blank log lines)
+                lines = [line for line in lines if line]
+                if lines:
+                    self._send(lines)
         except Exception as exception:
             notify_python_error(f"JarvisRedirect.write() failed: {exception}")
 
     def flush(self):
-        if not self._buffer:
-            return
-
         if self._redirect is None:
+            with self._lock:
+                if not self._buffer:
+                    return
+                self._buffer.clear()
             notify_python_error("JarvisRedirect.flush() called but redirect function is missing")
-            self._buffer = ""
             return
 
         try:
-            # Flush any trailing partial line as a full line
-            self._redirect((self._buffer + "\n").encode("utf-8"))
+            with self._lock:
+                if not self._buffer:
+                    return
+                try:
+                    # Flush any trailing partial line as a full line
+                    self._send([bytes(self._buffer)])
+                finally:
+                    self._buffer.clear()
         except Exception as exception:
             notify_python_error(f"JarvisRedirect.flush() failed: {exception}")
-        finally:
-            self._buffer = ""
 
 
 redir = _JarvisRedirect()
@@ -145,26 +166,179 @@ sys.excepthook = _global_exception_hook
 
 
 # --------------------------------------------------------------------
-# Regex for chunk output files
+# Documents converted to Markdown (same set as fileutils.is_pdf/is_docx/...)
 # --------------------------------------------------------------------
-CHUNK_OUTPUT_REGEX = re.compile(r"^chunk_(\d+)\.output\.md$")
+DOCUMENT_EXTENSIONS = frozenset({
+    ".pdf",
+    ".docx", ".doc",
+    ".xlsx", ".xls", ".csv",
+    ".pptx", ".ppt",
+})
 
 
-def is_md_up_to_date(markdown_path: Path) -> bool:
-    """Return True if foo.output.md exists and is newer."""
-    if not markdown_path.name.endswith(".md"):
+# --------------------------------------------------------------------
+# Chunk output file names: chunk_###.output.md
+# --------------------------------------------------------------------
+def is_chunk_output_name(file_name: str) -> bool:
+    """Return True for chunk_###.output.md file names."""
+    if not (file_name.startswith("chunk_") and file_name.endswith(".output.md")):
         return False
+    return file_name[6:-10].isdecimal()
+
+
+# --------------------------------------------------------------------
+# Background worker → OnEvent only queues work, jobs run in arrival order
+# --------------------------------------------------------------------
+_jobs = queue.SimpleQueue()  # (handler, args) or None to stop
+
+# OnShutdown waits this long for queued jobs; a long markitdown conversion
+# must not hold up PythonEngine::Stop() indefinitely
+WORKER_SHUTDOWN_TIMEOUT_SECONDS = 5.0
+
+
+def _worker():
+    while True:
+        job = _jobs.get()
+        if job is None:
+            return
+
+        handler, args = job
+        try:
+            handler(*args)
+        except Exception as exception:
+            notify_python_error(f"Background job {handler.__name__}{args} failed: {exception}")
+
+
+_worker_thread = threading.Thread(target=_worker, name="JarvisPyWorker", daemon=True)
+_worker_thread.start()
+
+
+# --------------------------------------------------------------------
+# Coalesce chunk output bursts → one combine per folder
+# --------------------------------------------------------------------
+# A chunker finishing many chunks at once fires one FileAdded per chunk
+# output; each combine rescans the whole folder, so bursts are collected
+# and combined once per folder after a short quiet period. All triggers of
+# a burst are kept: the combiner's early exit compares the combined output
+# with one trigger only, which must be the newest one.
+CHUNK_COMBINE_DELAY_SECONDS = 0.15
+CHUNK_COMBINE_MAX_WAIT_SECONDS = 1.0
+
+_pending_chunk_folders: dict[str, tuple[set[str], float]] = {}  # folder → (triggers, first seen)
+_pending_chunk_condition = threading.Condition()
+_chunk_combine_deadline = None  # time.monotonic() at which pending folders are combined
+
+
+def _schedule_chunk_combine(file_path: str):
+    global _chunk_combine_deadline
+
+    folder = os.path.dirname(file_path)
+    now = time.monotonic()
+
+    with _pending_chunk_condition:
+        triggers, first_seen = _pending_chunk_folders.setdefault(folder, (set(), now))
+        triggers.add(file_path)
+
+        # push the deadline back, but never the oldest pending folder past the max wait
+        oldest = min(seen for _, seen in _pending_chunk_folders.values())
+        idle = _chunk_combine_deadline is None
+        _chunk_combine_deadline = min(now + CHUNK_COMBINE_DELAY_SECONDS, oldest + CHUNK_COMBINE_MAX_WAIT_SECONDS)
+
+        # the deadline only ever moves later, so the timer thread needs waking
+        # only when it is idle; otherwise it re-reads the deadline on its own
+        if idle:
+            _pending_chunk_condition.notify()
+
+
+def _chunk_combine_timer():
+    # one long-lived thread instead of a threading.Timer per event
+    while True:
+        with _pending_chunk_condition:
+            while True:
+                if _chunk_combine_deadline is None:
+                    _pending_chunk_condition.wait()
+                    continue
+                remaining = _chunk_combine_deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                _pending_chunk_condition.wait(remaining)
+
+        _combine_pending_chunk_folders()
+
+
+def _combine_pending_chunk_folders():
+    global _chunk_combine_deadline
 
-    out_path = markdown_path.with_suffix(".output.md")
-    if not out_path.exists():
+    with _pending_chunk_condition:
+        pending = [triggers for triggers, _ in _pending_chunk_folders.values()]
+        _pending_chunk_folders.clear()
+        _chunk_combine_deadline = None
+
+    for triggers in pending:
+        _jobs.put((_combine_chunk_folder, (triggers,)))
+
+
+_chunk_combine_thread = threading.Thread(target=_chunk_combine_timer, name="JarvisPyChunkTimer", daemon=True)
+_chunk_combine_thread.start()
+
+
+def is_md_up_to_date(markdown_path: str) -> bool:
+    """Return True if foo.output.md exists and is newer."""
+    if not markdown_path.endswith(".md"):
         return False
 
+    # a missing foo.output.md surfaces as FileNotFoundError (an OSError)
     try:
-        return out_path.stat().st_mtime >= markdown_path.stat().st_mtime
+        out_mtime = os.stat(markdown_path[:-3] + ".output.md").st_mtime
+        return out_mtime >= os.stat(markdown_path).st_mtime
     except OSError:
         return False
 
 
+# --------------------------------------------------------------------
+# Jobs (run on the background worker)
+# --------------------------------------------------------------------
+def _convert_document(file_path: str):
+    try:
+        md_path = convert_with_markitdown(file_path)
+        log_info(f"Converted → Markdown: {md_path}")
+    except Exception as exception:
+        notify_python_error(f"Conversion failed for {file_path}: {exception}")
+
+
+def _newest_trigger(triggers) -> str:
+    """The most recently changed trigger; a vanished one wins (forces a full check)."""
+    def changed(path: str) -> float:
+        try:
+            return stat_changed(path)
+        except OSError:
+            return float("inf")
+
+    return max(triggers, key=changed)
+
+
+def _combine_chunk_folder(triggers):
+    # the single worker runs jobs one at a time, so combines never overlap
+    trigger = _newest_trigger(triggers)
+    try:
+        handle_chunk_output_added(trigger)
+    except Exception as exception:
+        notify_python_error(f"Chunk combining failed for {trigger}: {exception}")
+
+
+def _chunk_markdown(file_path: str):
+    # skip if already processed
+    if is_md_up_to_date(file_path):
+        log_info(f"Markdown already processed — skipping: {file_path}")
+        return
+
+    log_info(f"Markdown file detected for chunking: {file_path}")
+    try:
+        chunk_markdown_if_needed(file_path)
+    except Exception as exception:
+        notify_python_error(f"Markdown chunking failed for {file_path}: {exception}")
+
+
 # --------------------------------------------------------------------
 # Hook implementations
 # --------------------------------------------------------------------
@@ -179,64 +353,58 @@ def OnUpdate():
 
 def OnEvent(event):
 
-    event_type = event.get("type")
+    if event.get("type") != "FileAdded":
+        return
+
     file_path = event.get("path", "")
-    file_name = Path(file_path).name
+    file_name = os.path.basename(file_path)
+    dot = file_name.rfind(".")
+    extension = file_name[dot:].lower() if dot >= 0 else ""
 
     # ------------------------------------------------------------
     # DOCUMENT CONVERSION (PDF, DOCX, XLSX, PPTX)
     # ------------------------------------------------------------
-    if event_type == "FileAdded" and (
-        is_pdf(file_path)
-        or is_docx(file_path)
-        or is_xlsx(file_path)
-        or is_pptx(file_path)
-    ):
+    if extension in DOCUMENT_EXTENSIONS:
         log_info(f"Document detected: {file_path}")
-        try:
-            md_path = convert_with_markitdown(file_path)
-            log_info(f"Converted → Markdown: {md_path}")
-        except Exception as exception:
-            notify_python_error(f"Conversion failed for {file_path}: {exception}")
+        _jobs.put((_convert_document, (file_path,)))
         return
 
     # ------------------------------------------------------------
     # COMBINE CHUNK OUTPUT FILES
     # ------------------------------------------------------------
-    if event_type == "FileAdded" and CHUNK_OUTPUT_REGEX.match(file_name):
-        try:
-            handle_chunk_output_added(file_path)
-        except Exception as exception:
-            notify_python_error(f"Chunk combining failed for {file_path}: {exception}")
+    if is_chunk_output_name(file_name):
+        _schedule_chunk_combine(file_path)
         return
 
     # ------------------------------------------------------------
     # CHUNK LARGE MARKDOWN FILES
     # ------------------------------------------------------------
-    if event_type == "FileAdded" and file_path.endswith(".md"):
+    if file_name.endswith(".md"):
 
         # skip combined results
         if file_name.endswith(".output.md"):
             return
 
         # skip chunk outputs
-        if CHUNK_OUTPUT_REGEX.match(file_name):
-            return
-
-        md_path = Path(file_path)
-
-        # skip if already processed
-        if is_md_up_to_date(md_path):
-            log_info(f"Markdown already processed — skipping: {file_path}")
+        if is_chunk_output_name(file_name):
             return
 
-        log_info(f"Markdown file detected for chunking: {file_path}")
-        try:
-            chunk_markdown_if_needed(file_path)
-        except Exception as exception:
-            notify_python_error(f"Markdown chunking failed for {file_path}: {exception}")
+        _jobs.put((_chunk_markdown, (file_path,)))
         return
 
 
 def OnShutdown():
     log_info("Python OnShutdown() called.")
+
+    # don't drop a burst that is still waiting for its deadline
+    _combine_pending_chunk_folders()
+
+    # let the worker finish everything queued so far, then stop it
+    _jobs.put(None)
+    _worker_thread.join(WORKER_SHUTDOWN_TIMEOUT_SECONDS)
+    if _worker_thread.is_alive():
+        # daemon thread: abandoned with whatever it is still working on
+        log_warn(
+            f"Background worker still busy after {WORKER_SHUTDOWN_TIMEOUT_SECONDS:g}s "
+            "— shutting down without it, remaining jobs are dropped"
+        )